@@ -13,9 +13,9 @@
 # limitations under the License.
 
 import asyncio
-import traceback
 from typing import Any, Awaitable, Callable, Generic, TypeVar
 
+from playwright._impl._helper import extract_stack
 from playwright._impl._impl_to_api_mapping import ImplToApiMapping, ImplWrapper
 
 mapping = ImplToApiMapping()
@@ -58,7 +58,7 @@ class AsyncBase(ImplWrapper):
     def _async(self, api_name: str, coro: Awaitable) -> Any:
         task = asyncio.current_task()
         setattr(task, "__pw_api_name__", api_name)
-        setattr(task, "__pw_stack_trace__", traceback.extract_stack())
+        setattr(task, "__pw_stack_trace__", extract_stack())
         return coro
 
     def _wrap_handler(self, handler: Any) -> Callable[..., None]:
@@ -13,17 +13,34 @@
 # limitations under the License.
 
 import asyncio
-import sys
+import itertools
+import logging
+import time
 import traceback
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 
 from greenlet import greenlet
 from pyee import AsyncIOEventEmitter
 
-from playwright._impl._helper import ParsedMessagePayload, parse_error
+from playwright._impl._helper import ParsedMessagePayload, extract_stack, parse_error
 from playwright._impl._transport import Transport
 
+# Number of messages per event loop iteration which are sent without batching.
+EAGER_SEND_LIMIT = 2
+
+# JSON scalars make up most of the leaves in protocol payloads, the payload
+# walkers return them before going through the isinstance() checks.
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+# Number of serialized API call stacks kept around for reuse.
+STACK_CACHE_SIZE = 256
+
+# Errors raised by event listeners beyond this rate are not logged.
+MAX_DISPATCH_ERRORS_PER_SECOND = 10
+
+logger = logging.getLogger("playwright")
+
 
 class Channel(AsyncIOEventEmitter):
     def __init__(self, connection: "Connection", guid: str) -> None:
@@ -44,14 +61,24 @@ class Channel(AsyncIOEventEmitter):
         if params is None:
             params = {}
         callback = self._connection._send_message_to_server(self._guid, method, params)
-
-        done, pending = await asyncio.wait(
-            {self._connection._transport.on_error_future, callback.future},
-            return_when=asyncio.FIRST_COMPLETED,
-        )
-        if not callback.future.done():
+        on_error_future = self._connection._transport.on_error_future
+        if on_error_future.done():
             callback.future.cancel()
-        result = next(iter(done)).result()
+            on_error_future.result()
+
+        def _on_transport_error(error_future: asyncio.Future) -> None:
+            if callback.future.done():
+                return
+            if error_future.cancelled():
+                callback.future.cancel()
+            else:
+                callback.future.set_exception(error_future.exception())  # type: ignore
+
+        on_error_future.add_done_callback(_on_transport_error)
+        try:
+            result = await callback.future
+        finally:
+            on_error_future.remove_done_callback(_on_transport_error)
         # Protocol now has named return values, assume result is one level deeper unless
         # there is explicit ambiguity.
         if not result:
@@ -59,16 +86,15 @@ class Channel(AsyncIOEventEmitter):
         assert isinstance(result, dict)
         if return_as_dict:
             return result
-        if len(result) == 0:
-            return None
         assert len(result) == 1
-        key = next(iter(result))
-        return result[key]
+        return result.popitem()[1]
 
     def send_no_reply(self, method: str, params: Dict = None) -> None:
         if params is None:
             params = {}
-        self._connection._send_message_to_server(self._guid, method, params)
+        self._connection._send_message_to_server(
+            self._guid, method, params, no_reply=True
+        )
 
 
 class ChannelOwner(AsyncIOEventEmitter):
@@ -110,6 +136,7 @@ class ChannelOwner(AsyncIOEventEmitter):
                     "phase": "before",
                 }
             },
+            no_reply=True,
         )
 
     def _wait_for_event_info_after(
@@ -122,24 +149,28 @@ class ChannelOwner(AsyncIOEventEmitter):
             self._guid,
             "waitForEventInfo",
             {"info": info},
+            no_reply=True,
         )
 
     def _dispose(self) -> None:
-        # Clean up from parent and connection.
+        # Clean up from parent.
         if self._parent:
-            del self._parent._objects[self._guid]
-        del self._connection._objects[self._guid]
+            self._parent._objects.pop(self._guid, None)
 
-        # Dispose all children.
-        for object in list(self._objects.values()):
-            object._dispose()
-        self._objects.clear()
+        # Clean up this object and all its descendants from the connection,
+        # iteratively so that deep object trees don't hit the recursion limit.
+        connection_objects = self._connection._objects
+        stack: List[ChannelOwner] = [self]
+        while stack:
+            object = stack.pop()
+            connection_objects.pop(object._guid, None)
+            stack.extend(object._objects.values())
+            object._objects.clear()
 
 
-class ProtocolCallback:
-    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
-        self.stack_trace: traceback.StackSummary = traceback.StackSummary()
-        self.future = loop.create_future()
+class ProtocolCallback(NamedTuple):
+    future: asyncio.Future
+    stack_trace: traceback.StackSummary
 
 
 class RootChannelOwner(ChannelOwner):
@@ -156,13 +187,22 @@ class Connection:
     ) -> None:
         self._dispatcher_fiber = dispatcher_fiber
         self._transport = transport
-        self._transport.on_message = lambda msg: self._dispatch(msg)
+        self._transport.on_message = self._dispatch
         self._waiting_for_object: Dict[str, Any] = {}
-        self._last_id = 0
+        self._next_id = itertools.count(1).__next__
+        self._coalesce_sends = transport.supports_send_many
+        self._pending_send: List[Dict] = []
+        self._eager_send_count = 0
+        self._stack_cache: Dict[int, Tuple[traceback.StackSummary, List[Dict]]] = {}
         self._objects: Dict[str, ChannelOwner] = {}
         self._callbacks: Dict[int, ProtocolCallback] = {}
         self._object_factory = object_factory
         self._is_sync = False
+        self._listener_fiber: Optional[greenlet] = None
+        self._listener_fiber_busy = False
+        self._dispatch_error_tokens: float = MAX_DISPATCH_ERRORS_PER_SECOND
+        self._last_dispatch_error_time = time.monotonic()
+        self._suppressed_dispatch_errors = 0
         self._api_name = ""
         self._child_ws_connections: List["Connection"] = []
 
@@ -176,16 +216,21 @@ class Connection:
         await self._transport.run()
 
     def stop_sync(self) -> None:
+        self._flush_send()
         self._transport.request_stop()
         self._dispatcher_fiber.switch()
         self.cleanup()
 
     async def stop_async(self) -> None:
+        self._flush_send()
         self._transport.request_stop()
         await self._transport.wait_until_stopped()
         self.cleanup()
 
     def cleanup(self) -> None:
+        # The suspended worker references the connection through its frame,
+        # the garbage collector can't break that cycle.
+        self._listener_fiber = None
         for ws_connection in self._child_ws_connections:
             ws_connection._transport.dispose()
 
@@ -206,76 +251,183 @@ class Connection:
         self._waiting_for_object[guid] = callback
 
     def _send_message_to_server(
-        self, guid: str, method: str, params: Dict
+        self, guid: str, method: str, params: Dict, no_reply: bool = False
     ) -> ProtocolCallback:
-        self._last_id += 1
-        id = self._last_id
-        callback = ProtocolCallback(self._loop)
+        id = self._next_id()
         task = asyncio.current_task(self._loop)
-        callback.stack_trace = getattr(task, "__pw_stack_trace__", None)
-        if not callback.stack_trace:
-            callback.stack_trace = traceback.extract_stack()
-
-        metadata = {"stack": serialize_call_stack(callback.stack_trace)}
+        stack_trace = getattr(task, "__pw_stack_trace__", None)
+        if stack_trace:
+            stack = self._serialize_task_call_stack(stack_trace)
+        else:
+            stack_trace = extract_stack()
+            stack = serialize_call_stack(stack_trace)
+        callback = ProtocolCallback(self._loop.create_future(), stack_trace)
+        if no_reply:
+            # Nobody awaits the result, don't warn about unretrieved errors.
+            callback.future.add_done_callback(_retrieve_exception)
+
+        metadata = {"stack": stack}
         api_name = getattr(task, "__pw_api_name__", None)
         if api_name:
             metadata["apiName"] = api_name
 
+        if _contains_channel(params):
+            params = self._replace_channels_with_guids(params, "params")
         message = dict(
             id=id,
             guid=guid,
             method=method,
-            params=self._replace_channels_with_guids(params, "params"),
+            params=params,
             metadata=metadata,
         )
-        self._transport.send(message)
         self._callbacks[id] = callback
+        try:
+            self._queue_message(message)
+        except Exception:
+            del self._callbacks[id]
+            raise
         return callback
 
-    def _dispatch(self, msg: ParsedMessagePayload) -> None:
+    def _serialize_task_call_stack(
+        self, stack_trace: traceback.StackSummary
+    ) -> List[Dict]:
+        # All the messages sent on behalf of one API call share its stack.
+        key = id(stack_trace)
+        cached = self._stack_cache.get(key)
+        if cached and cached[0] is stack_trace:
+            return cached[1]
+        stack = serialize_call_stack(stack_trace)
+        if len(self._stack_cache) >= STACK_CACHE_SIZE:
+            del self._stack_cache[next(iter(self._stack_cache))]
+        self._stack_cache[key] = (stack_trace, stack)
+        return stack
+
+    def _queue_message(self, message: Dict) -> None:
+        if not self._coalesce_sends:
+            self._transport.send(message)
+            return
+        # The first few messages of a loop iteration go out immediately to keep
+        # latency low, the rest are coalesced into a single transport write.
+        if not self._pending_send and self._eager_send_count < EAGER_SEND_LIMIT:
+            if self._eager_send_count == 0:
+                self._loop.call_soon(self._flush_send)
+            self._eager_send_count += 1
+            self._transport.send(message)
+            return
+        self._pending_send.append(message)
+
+    def _flush_send(self) -> None:
+        self._eager_send_count = 0
+        messages = self._pending_send
+        if not messages:
+            return
+        self._pending_send = []
+        try:
+            self._transport.send_many(messages)
+        except Exception as exc:
+            # send_many() either sends all the messages or none of them.
+            for message in messages:
+                callback = self._callbacks.pop(message["id"], None)
+                if callback and not callback.future.done():
+                    callback.future.set_exception(exc)
+
+    def _dispatch(self, msg: ParsedMessagePayload, has_guids: bool = True) -> None:
         id = msg.get("id")
         if id:
-            callback = self._callbacks.pop(id)
-            if callback.future.cancelled():
+            callback = self._callbacks.pop(id, None)
+            if callback is None:
+                return
+            future, stack_trace = callback
+            if future.done():
                 return
             error = msg.get("error")
             if error:
                 parsed_error = parse_error(error["error"])  # type: ignore
-                parsed_error.stack = "".join(
-                    traceback.format_list(callback.stack_trace)[-10:]
-                )
-                callback.future.set_exception(parsed_error)
+                parsed_error.stack = "".join(traceback.format_list(stack_trace[-10:]))
+                future.set_exception(parsed_error)
             else:
-                result = self._replace_guids_with_channels(msg.get("result"))
-                callback.future.set_result(result)
+                result = msg.get("result")
+                if has_guids:
+                    result = self._replace_guids_with_channels(result)
+                future.set_result(result)
             return
 
         guid = msg["guid"]
         method = msg.get("method")
         params = msg["params"]
+        object = self._objects.get(guid)
+        if object is None:
+            return
         if method == "__create__":
-            parent = self._objects[guid]
             self._create_remote_object(
-                parent, params["type"], params["guid"], params["initializer"]
+                object, params["type"], params["guid"], params["initializer"]
             )
             return
         if method == "__dispose__":
-            self._objects[guid]._dispose()
+            object._dispose()
             return
 
-        object = self._objects[guid]
+        channel = object._channel
+        replace_guids_with_channels = self._replace_guids_with_channels
         try:
             if self._is_sync:
-                for listener in object._channel.listeners(method):
-                    g = greenlet(listener)
-                    g.switch(self._replace_guids_with_channels(params))
+                switch_to_listener = self._switch_to_listener
+                for listener in channel.listeners(method):
+                    switch_to_listener(listener, replace_guids_with_channels(params))
             else:
-                object._channel.emit(method, self._replace_guids_with_channels(params))
+                channel.emit(method, replace_guids_with_channels(params))
         except Exception:
-            print(
-                "Error dispatching the event",
-                "".join(traceback.format_exception(*sys.exc_info())),
-            )
+            self._report_dispatch_error()
+
+    def _report_dispatch_error(self) -> None:
+        # Token bucket, so that a listener failing in a loop can't slow down
+        # the dispatcher by flooding the logs.
+        now = time.monotonic()
+        self._dispatch_error_tokens = min(
+            MAX_DISPATCH_ERRORS_PER_SECOND,
+            self._dispatch_error_tokens
+            + (now - self._last_dispatch_error_time) * MAX_DISPATCH_ERRORS_PER_SECOND,
+        )
+        self._last_dispatch_error_time = now
+        if self._dispatch_error_tokens < 1:
+            if not self._suppressed_dispatch_errors:
+                self._loop.call_later(
+                    (1 - self._dispatch_error_tokens) / MAX_DISPATCH_ERRORS_PER_SECOND,
+                    self._report_suppressed_dispatch_errors,
+                )
+            self._suppressed_dispatch_errors += 1
+            return
+        self._dispatch_error_tokens -= 1
+        logger.exception("Error dispatching the event")
+
+    def _report_suppressed_dispatch_errors(self) -> None:
+        logger.warning(
+            "%d listener errors suppressed", self._suppressed_dispatch_errors
+        )
+        self._suppressed_dispatch_errors = 0
+
+    def _switch_to_listener(self, listener: Callable, params: Any) -> None:
+        worker = self._listener_fiber
+        if worker is None or worker.dead:
+            worker = self._listener_fiber = greenlet(self._run_listeners)
+            worker.switch()
+        elif self._listener_fiber_busy:
+            # The worker is suspended in a listener which waits for an API call.
+            greenlet(listener).switch(params)
+            return
+        worker.switch(listener, params)
+
+    def _run_listeners(self) -> None:
+        # Listeners are passed in through switch() rather than as arguments of
+        # run, which would stay referenced for the lifetime of the greenlet.
+        dispatcher_fiber = greenlet.getcurrent().parent
+        while True:
+            listener, params = dispatcher_fiber.switch()
+            self._listener_fiber_busy = True
+            listener(params)
+            self._listener_fiber_busy = False
+            # Don't keep the last event alive while waiting for the next one.
+            listener = params = None
 
     def _create_remote_object(
         self, parent: ChannelOwner, type: str, guid: str, initializer: Dict
@@ -288,14 +440,13 @@ class Connection:
         return result
 
     def _replace_channels_with_guids(self, payload: Any, param_name: str) -> Any:
-        if payload is None:
+        if type(payload) in _SCALAR_TYPES:
             return payload
         if isinstance(payload, Path):
             return str(payload)
         if isinstance(payload, list):
-            return list(
-                map(lambda p: self._replace_channels_with_guids(p, "index"), payload)
-            )
+            replace_channels_with_guids = self._replace_channels_with_guids
+            return [replace_channels_with_guids(p, "index") for p in payload]
         if isinstance(payload, Channel):
             return dict(guid=payload._guid)
         if isinstance(payload, dict):
@@ -306,13 +457,16 @@ class Connection:
         return payload
 
     def _replace_guids_with_channels(self, payload: Any) -> Any:
-        if payload is None:
+        if type(payload) in _SCALAR_TYPES:
             return payload
         if isinstance(payload, list):
-            return list(map(lambda p: self._replace_guids_with_channels(p), payload))
+            replace_guids_with_channels = self._replace_guids_with_channels
+            return [replace_guids_with_channels(p) for p in payload]
         if isinstance(payload, dict):
-            if payload.get("guid") in self._objects:
-                return self._objects[payload["guid"]]._channel
+            guid = payload.get("guid")
+            object = self._objects.get(guid) if guid is not None else None
+            if object is not None:
+                return object._channel
             result = {}
             for key in payload:
                 result[key] = self._replace_guids_with_channels(payload[key])
@@ -320,6 +474,24 @@ class Connection:
         return payload
 
 
+def _retrieve_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+def _contains_channel(payload: Any) -> bool:
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, (Channel, Path)):
+            return True
+    return False
+
+
 def from_channel(channel: Channel) -> Any:
     return channel._object
 
@@ -20,7 +20,7 @@ import sys
 import time
 import traceback
 from pathlib import Path
-from types import TracebackType
+from types import FrameType, TracebackType
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -189,6 +189,23 @@ def patch_error_message(message: Optional[str]) -> Optional[str]:
     return message
 
 
+def extract_stack() -> traceback.StackSummary:
+    # Like traceback.extract_stack(), but source lines are only read once the
+    # stack gets formatted, which is the error path only.
+    frames: List[traceback.FrameSummary] = []
+    frame: Optional[FrameType] = sys._getframe(1)
+    while frame:
+        code = frame.f_code
+        frames.append(
+            traceback.FrameSummary(
+                code.co_filename, frame.f_lineno, code.co_name, lookup_line=False
+            )
+        )
+        frame = frame.f_back
+    frames.reverse()
+    return traceback.StackSummary.from_list(frames)
+
+
 def locals_to_params(args: Dict) -> Dict:
     copy = {}
     for key in args:
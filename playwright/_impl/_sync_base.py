@@ -13,7 +13,6 @@
 # limitations under the License.
 
 import asyncio
-import traceback
 from typing import (
     Any,
     Awaitable,
@@ -28,6 +27,7 @@ from typing import (
 
 import greenlet
 
+from playwright._impl._helper import extract_stack
 from playwright._impl._impl_to_api_mapping import ImplToApiMapping, ImplWrapper
 
 mapping = ImplToApiMapping()
@@ -91,7 +91,7 @@ class SyncBase(ImplWrapper):
         g_self = greenlet.getcurrent()
         task = self._loop.create_task(coro)
         setattr(task, "__pw_api_name__", api_name)
-        setattr(task, "__pw_stack_trace__", traceback.extract_stack())
+        setattr(task, "__pw_stack_trace__", extract_stack())
 
         def callback(result: Any) -> None:
             g_self.switch()
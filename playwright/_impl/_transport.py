@@ -16,16 +16,62 @@ import asyncio
 import io
 import json
 import os
+import re
 import sys
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import websockets
 from pyee import AsyncIOEventEmitter
 
 from playwright._impl._api_types import Error
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+# orjson decodes integers which don't fit into 64 bits as floats. Any payload
+# which might contain one is left to the json module.
+_MAYBE_WIDE_INTEGER = re.compile(r"\d{19}")
+_MAYBE_WIDE_INTEGER_BYTES = re.compile(rb"\d{19}")
+
+
+def _json_dumps(obj: Any) -> bytes:
+    if orjson:
+        try:
+            # Dataclasses and datetimes are left to the fallback, which rejects
+            # them. orjson still serializes some values the json module does
+            # not, e.g. UUIDs and enums.
+            return orjson.dumps(
+                obj,
+                option=orjson.OPT_PASSTHROUGH_DATACLASS
+                | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # orjson rejects some values the json module accepts, e.g. integers
+            # which do not fit into 64 bits.
+            pass
+    return json.dumps(obj).encode()
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    if orjson:
+        if isinstance(data, bytes):
+            maybe_wide_integer = bool(_MAYBE_WIDE_INTEGER_BYTES.search(data))
+        else:
+            maybe_wide_integer = bool(_MAYBE_WIDE_INTEGER.search(data))
+        if not maybe_wide_integer:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # orjson rejects some documents the json module accepts, e.g.
+                # strings with lone surrogates.
+                pass
+    return json.loads(data)
+
 
 # Sourced from: https://github.com/pytest-dev/pytest/blob/da01ee0a4bb0af780167ecd228ab3ad249511302/src/_pytest/faulthandler.py#L69-L77
 def _get_stderr_fileno() -> Optional[int]:
@@ -43,7 +89,8 @@ def _get_stderr_fileno() -> Optional[int]:
 class Transport(ABC):
     def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
         self._loop = loop
-        self.on_message = lambda _: None
+        # Called with each message and whether it can reference remote objects.
+        self.on_message: Callable[[Any, bool], None] = lambda _, __: None
         self.on_error_future: asyncio.Future = loop.create_future()
 
     @abstractmethod
@@ -65,21 +112,33 @@ class Transport(ABC):
     def send(self, message: Dict) -> None:
         pass
 
+    # Transports which set this get their messages coalesced into send_many()
+    # calls. It has to either send all the messages or raise without sending
+    # any of them.
+    supports_send_many = False
+    send_many: Callable[[List[Dict]], None]
+
     def serialize_message(self, message: Dict) -> bytes:
-        msg = json.dumps(message)
+        msg = _json_dumps(message)
         if "DEBUGP" in os.environ:  # pragma: no cover
             print("\x1b[32mSEND>\x1b[0m", json.dumps(message, indent=2))
-        return msg.encode()
+        return msg
 
-    def deserialize_message(self, data: bytes) -> Any:
-        obj = json.loads(data)
+    def deserialize_message(self, data: Union[str, bytes]) -> Tuple[Any, bool]:
+        obj = _json_loads(data)
+        if isinstance(data, bytes):
+            has_guids = b'"guid"' in data
+        else:
+            has_guids = '"guid"' in data
 
         if "DEBUGP" in os.environ:  # pragma: no cover
             print("\x1b[33mRECV>\x1b[0m", json.dumps(obj, indent=2))
-        return obj
+        return obj, has_guids
 
 
 class PipeTransport(Transport):
+    supports_send_many = True
+
     def __init__(
         self, loop: asyncio.AbstractEventLoop, driver_executable: Path
     ) -> None:
@@ -129,18 +188,22 @@ class PipeTransport(Transport):
                     else:
                         buffer = data
 
-                obj = self.deserialize_message(buffer)
-                self.on_message(obj)
+                obj, has_guids = self.deserialize_message(buffer)
+                self.on_message(obj, has_guids)
             except asyncio.IncompleteReadError:
                 break
             await asyncio.sleep(0)
         self._stopped_future.set_result(None)
 
     def send(self, message: Dict) -> None:
+        self._output.write(self._frame_message(message))
+
+    def send_many(self, messages: List[Dict]) -> None:
+        self._output.write(b"".join(map(self._frame_message, messages)))
+
+    def _frame_message(self, message: Dict) -> bytes:
         data = self.serialize_message(message)
-        self._output.write(
-            len(data).to_bytes(4, byteorder="little", signed=False) + data
-        )
+        return len(data).to_bytes(4, byteorder="little", signed=False) + data
 
 
 class WebSocketTransport(AsyncIOEventEmitter, Transport):
@@ -189,8 +252,8 @@ class WebSocketTransport(AsyncIOEventEmitter, Transport):
                         Error("Playwright connection closed")
                     )
                     break
-                obj = self.deserialize_message(message)
-                self.on_message(obj)
+                obj, has_guids = self.deserialize_message(message)
+                self.on_message(obj, has_guids)
             except (
                 websockets.exceptions.ConnectionClosed,
                 websockets.exceptions.ConnectionClosedError,
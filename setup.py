@@ -145,6 +145,7 @@ setup(
         "pyee>=8.0.1",
         "typing-extensions;python_version<='3.8'",
     ],
+    extras_require={"orjson": ["orjson>=3.3"]},
     classifiers=[
         "Topic :: Software Development :: Testing",
         "Topic :: Internet :: WWW/HTTP :: Browsers",
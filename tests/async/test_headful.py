@@ -16,6 +16,13 @@
 import pytest
 
 
+@pytest.fixture(scope="module")
+async def headful_browser(browser_type, launch_arguments):
+    browser = await browser_type.launch(**{**launch_arguments, "headless": False})
+    yield browser
+    await browser.close()
+
+
 async def test_should_have_default_url_when_launching_browser(
     browser_type, launch_arguments, tmpdir
 ):
@@ -41,28 +48,24 @@ async def test_should_close_browser_with_beforeunload_page(
     await browser_context.close()
 
 
-async def test_should_not_crash_when_creating_second_context(
-    browser_type, launch_arguments, server
-):
-    browser = await browser_type.launch(**{**launch_arguments, "headless": False})
-    browser_context = await browser.new_context()
+async def test_should_not_crash_when_creating_second_context(headful_browser, server):
+    browser_context = await headful_browser.new_context()
     await browser_context.new_page()
     await browser_context.close()
-    browser_context = await browser.new_context()
+    browser_context = await headful_browser.new_context()
     await browser_context.new_page()
     await browser_context.close()
-    await browser.close()
 
 
-async def test_should_click_background_tab(browser_type, launch_arguments, server):
-    browser = await browser_type.launch(**{**launch_arguments, "headless": False})
-    page = await browser.new_page()
+async def test_should_click_background_tab(headful_browser, server):
+    context = await headful_browser.new_context()
+    page = await context.new_page()
     await page.set_content(
         f'<button>Hello</button><a target=_blank href="{server.EMPTY_PAGE}">empty.html</a>'
     )
     await page.click("a")
     await page.click("button")
-    await browser.close()
+    await context.close()
 
 
 async def test_should_close_browser_after_context_menu_was_triggered(
@@ -76,10 +79,10 @@ async def test_should_close_browser_after_context_menu_was_triggered(
 
 
 async def test_should_not_block_third_party_cookies(
-    browser_type, launch_arguments, server, is_chromium, is_firefox
+    headful_browser, server, is_chromium, is_firefox
 ):
-    browser = await browser_type.launch(**{**launch_arguments, "headless": False})
-    page = await browser.new_page()
+    context = await headful_browser.new_context()
+    page = await context.new_page()
     await page.goto(server.EMPTY_PAGE)
     await page.evaluate(
         """src => {
@@ -120,16 +123,15 @@ async def test_should_not_block_third_party_cookies(
     else:
         assert cookies == []
 
-    await browser.close()
+    await context.close()
 
 
 @pytest.mark.skip_browser("webkit")
 async def test_should_not_override_viewport_size_when_passed_null(
-    browser_type, launch_arguments, server
+    headful_browser, server
 ):
     # Our WebKit embedder does not respect window features.
-    browser = await browser_type.launch(**{**launch_arguments, "headless": False})
-    context = await browser.new_context(no_viewport=True)
+    context = await headful_browser.new_context(no_viewport=True)
     page = await context.new_page()
     await page.goto(server.EMPTY_PAGE)
     async with page.expect_popup() as popup_info:
@@ -145,14 +147,13 @@ async def test_should_not_override_viewport_size_when_passed_null(
         """() => window.outerWidth === 500 && window.outerHeight === 450"""
     )
     await context.close()
-    await browser.close()
 
 
-async def test_page_bring_to_front_should_work(browser_type, launch_arguments):
-    browser = await browser_type.launch(**{**launch_arguments, "headless": False})
-    page1 = await browser.new_page()
+@pytest.mark.serial
+async def test_page_bring_to_front_should_work(headful_browser):
+    page1 = await headful_browser.new_page()
     await page1.set_content("Page1")
-    page2 = await browser.new_page()
+    page2 = await headful_browser.new_page()
     await page2.set_content("Page2")
 
     await page1.bring_to_front()
@@ -162,4 +163,5 @@ async def test_page_bring_to_front_should_work(browser_type, launch_arguments):
     await page2.bring_to_front()
     assert await page1.evaluate("document.visibilityState") == "visible"
     assert await page2.evaluate("document.visibilityState") == "visible"
-    await browser.close()
+    await page1.close()
+    await page2.close()
@@ -0,0 +1,241 @@
+# Copyright (c) Microsoft Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import gc
+import weakref
+from typing import Dict, List
+
+import pytest
+
+from playwright._impl._api_types import Error
+from playwright._impl._connection import (
+    EAGER_SEND_LIMIT,
+    MAX_DISPATCH_ERRORS_PER_SECOND,
+    ChannelOwner,
+    Connection,
+)
+from playwright._impl._transport import Transport
+
+
+class FakeTransport(Transport):
+    supports_send_many = True
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        super().__init__(loop)
+        self.writes: List[List[Dict]] = []
+        self.send_many_error = None
+
+    def request_stop(self) -> None:
+        pass
+
+    async def wait_until_stopped(self) -> None:
+        pass
+
+    async def run(self) -> None:
+        pass
+
+    def send(self, message: Dict) -> None:
+        self.writes.append([message])
+        self._reply(message)
+
+    def send_many(self, messages: List[Dict]) -> None:
+        if self.send_many_error:
+            raise self.send_many_error
+        self.writes.append(list(messages))
+        for message in messages:
+            self._reply(message)
+
+    def _reply(self, message: Dict) -> None:
+        response = {"id": message["id"], "result": {"value": message["params"]}}
+        self._loop.call_soon(
+            self.on_message, *self.deserialize_message(self.serialize_message(response))
+        )
+
+
+async def create_connection(transport_class=FakeTransport):
+    transport = transport_class(asyncio.get_running_loop())
+    connection = Connection(None, ChannelOwner, transport)
+    await connection.run()
+    return connection, transport
+
+
+class SilentTransport(FakeTransport):
+    def _reply(self, message: Dict) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_should_fail_pending_calls_on_transport_error():
+    connection, transport = await create_connection(SilentTransport)
+    channel = connection._root_object._channel
+    pending = asyncio.ensure_future(channel.send("method"))
+    await asyncio.sleep(0)
+    assert not pending.done()
+    error = Error("Playwright connection closed")
+    transport.on_error_future.set_exception(error)
+    with pytest.raises(Error) as exc_info:
+        await pending
+    assert exc_info.value is error
+    with pytest.raises(Error) as exc_info:
+        await channel.send("method")
+    assert exc_info.value is error
+
+
+@pytest.mark.asyncio
+async def test_should_coalesce_messages_sent_in_one_loop_iteration():
+    connection, transport = await create_connection()
+    channel = connection._root_object._channel
+    count = EAGER_SEND_LIMIT + 3
+    results = await asyncio.gather(
+        *[channel.send("method", {"index": index}) for index in range(count)]
+    )
+    assert results == [{"index": index} for index in range(count)]
+    assert [len(write) for write in transport.writes] == [1] * EAGER_SEND_LIMIT + [3]
+    sent = [
+        message["params"]["index"] for write in transport.writes for message in write
+    ]
+    assert sent == list(range(count))
+
+
+@pytest.mark.asyncio
+async def test_should_fail_queued_messages_when_send_many_fails():
+    connection, transport = await create_connection()
+    transport.send_many_error = Error("Write failed")
+    channel = connection._root_object._channel
+    count = EAGER_SEND_LIMIT + 3
+    results = await asyncio.gather(
+        *[channel.send("method", {"index": index}) for index in range(count)],
+        return_exceptions=True,
+    )
+    assert results[:EAGER_SEND_LIMIT] == [
+        {"index": index} for index in range(EAGER_SEND_LIMIT)
+    ]
+    assert results[EAGER_SEND_LIMIT:] == [transport.send_many_error] * 3
+    assert connection._callbacks == {}
+
+
+@pytest.mark.asyncio
+async def test_should_not_report_unretrieved_errors_of_no_reply_messages():
+    connection, transport = await create_connection()
+    transport.send_many_error = Error("Write failed")
+    loop = asyncio.get_running_loop()
+    reported = []
+    loop.set_exception_handler(lambda loop, context: reported.append(context))
+    try:
+        channel = connection._root_object._channel
+        for index in range(EAGER_SEND_LIMIT + 3):
+            channel.send_no_reply("method", {"index": index})
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+    assert reported == []
+
+
+@pytest.mark.asyncio
+async def test_should_resolve_guids_in_results_only_when_present(monkeypatch):
+    connection, transport = await create_connection()
+    child = connection._create_remote_object(
+        connection._root_object, "Child", "child", {}
+    )
+    walked = []
+    replace_guids_with_channels = connection._replace_guids_with_channels
+
+    def spy(payload):
+        walked.append(payload)
+        return replace_guids_with_channels(payload)
+
+    monkeypatch.setattr(connection, "_replace_guids_with_channels", spy)
+    channel = connection._root_object._channel
+    assert await channel.send("method", {"guid": "child"}) is child._channel
+    assert walked
+    walked.clear()
+    assert await channel.send("method", {"text": "hello"}) == {"text": "hello"}
+    assert walked == []
+
+
+@pytest.mark.asyncio
+async def test_should_log_listener_errors_with_a_rate_limit(caplog):
+    connection, transport = await create_connection()
+
+    def listener(params):
+        raise ValueError("Listener failed")
+
+    connection._root_object._channel.on("event", listener)
+    for _ in range(MAX_DISPATCH_ERRORS_PER_SECOND + 5):
+        connection._dispatch({"guid": "", "method": "event", "params": {}})
+    records = [record for record in caplog.records if record.name == "playwright"]
+    assert len(records) == MAX_DISPATCH_ERRORS_PER_SECOND
+    assert all(record.exc_info[0] is ValueError for record in records)
+
+    await asyncio.sleep(2 / MAX_DISPATCH_ERRORS_PER_SECOND)
+    records = [record for record in caplog.records if record.name == "playwright"]
+    assert records[-1].getMessage() == "5 listener errors suppressed"
+
+
+@pytest.mark.asyncio
+async def test_should_dispose_deep_object_trees():
+    connection, transport = await create_connection()
+    parent = connection._root_object
+    for index in range(5000):
+        parent = connection._create_remote_object(parent, "Child", f"child{index}", {})
+    connection._dispatch({"guid": "child0", "method": "__dispose__", "params": {}})
+    assert list(connection._objects) == [""]
+    assert connection._root_object._objects == {}
+
+
+class UncoalescedTransport(FakeTransport):
+    supports_send_many = False
+
+
+@pytest.mark.asyncio
+async def test_should_send_one_by_one_when_transport_does_not_coalesce():
+    connection, transport = await create_connection(UncoalescedTransport)
+    channel = connection._root_object._channel
+    count = EAGER_SEND_LIMIT + 3
+    await asyncio.gather(
+        *[channel.send("method", {"index": index}) for index in range(count)]
+    )
+    assert [len(write) for write in transport.writes] == [1] * count
+
+
+@pytest.mark.asyncio
+async def test_should_not_keep_sync_listeners_alive():
+    connection, transport = await create_connection()
+    connection._is_sync = True
+    channel = connection._root_object._channel
+    calls = []
+
+    def listener(params):
+        calls.append(params)
+
+    channel.on("event", listener)
+    connection._dispatch({"guid": "", "method": "event", "params": {}})
+    assert calls == [{}]
+
+    listener_ref = weakref.ref(listener)
+    channel.remove_listener("event", listener)
+    del listener
+    gc.collect()
+    assert listener_ref() is None
+
+    connection_ref = weakref.ref(connection)
+    root_object_ref = weakref.ref(connection._root_object)
+    connection.cleanup()
+    del connection, transport, channel
+    gc.collect()
+    assert connection_ref() is None
+    assert root_object_ref() is None
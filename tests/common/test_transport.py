@@ -0,0 +1,65 @@
+# Copyright (c) Microsoft Corporation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+
+import pytest
+
+from playwright._impl import _transport
+from playwright._impl._transport import _json_dumps, _json_loads
+
+MESSAGE = {"id": 1, "params": {"text": "héllo", "list": [1, 2.5, True, None]}}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(_transport, "orjson", None)
+    return request.param
+
+
+def test_should_serialize_messages(json_backend):
+    assert json.loads(_json_dumps(MESSAGE)) == MESSAGE
+
+
+def test_should_serialize_integers_wider_than_64_bits(json_backend):
+    message = {"id": 1, "params": {"value": 2 ** 70}}
+    assert json.loads(_json_dumps(message)) == message
+
+
+def test_should_reject_values_json_can_not_serialize(json_backend):
+    with pytest.raises(TypeError):
+        _json_dumps({"id": 1, "params": {"value": datetime.datetime.now()}})
+
+
+@pytest.mark.parametrize("data", [json.dumps(MESSAGE), json.dumps(MESSAGE).encode()])
+def test_should_deserialize_messages(json_backend, data):
+    assert _json_loads(data) == MESSAGE
+
+
+@pytest.mark.parametrize("value", [2 ** 70, -(2 ** 63) - 1, 10 ** 20])
+def test_should_deserialize_integers_wider_than_64_bits(json_backend, value):
+    result = _json_loads(json.dumps({"value": value}).encode())
+    assert type(result["value"]) is int
+    assert result["value"] == value
+
+
+def test_should_deserialize_lone_surrogates(json_backend):
+    assert _json_loads(b'{"id":1,"result":{"value":"\\ud83d"}}') == {
+        "id": 1,
+        "result": {"value": "\ud83d"},
+    }
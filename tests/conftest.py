@@ -13,9 +13,11 @@
 # limitations under the License.
 
 import asyncio
+import functools
 import inspect
 import io
 import json
+import os
 import subprocess
 import sys
 from pathlib import Path
@@ -31,6 +33,11 @@ from playwright._impl._path_utils import get_file_dirname
 
 from .server import test_server
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 _dirname = get_file_dirname()
 
 
@@ -41,8 +48,14 @@ def pytest_generate_tests(metafunc):
 
 
 @pytest.fixture(scope="session")
-def event_loop():
-    loop = asyncio.get_event_loop()
+def event_loop(pytestconfig):
+    if pytestconfig.getoption("--uvloop"):
+        import uvloop
+
+        loop = uvloop.new_event_loop()
+        asyncio.set_event_loop(loop)
+    else:
+        loop = asyncio.get_event_loop()
     yield loop
     loop.close()
 
@@ -164,6 +177,16 @@ def skip_by_platform(request):
         pytest.skip(f"skipped on this platform: {sys.platform}")
 
 
+@pytest.fixture(autouse=True)
+def skip_serial_under_xdist(request):
+    # Tests which need exclusive window focus can't share the display with
+    # other pytest-xdist workers.
+    if request.node.get_closest_marker("serial") and os.environ.get(
+        "PYTEST_XDIST_WORKER"
+    ):
+        pytest.skip("needs to run serially, without pytest-xdist")
+
+
 def pytest_addoption(parser):
     group = parser.getgroup("playwright", "Playwright")
     group.addoption(
@@ -184,21 +207,62 @@ def pytest_addoption(parser):
         default=False,
         help="Run tests in headful mode.",
     )
+    parser.addoption(
+        "--uvloop",
+        action="store_true",
+        default=False,
+        help="Run the async tests on uvloop instead of the default asyncio loop.",
+    )
+
+
+def _blend_with_white(image: "np.ndarray") -> "np.ndarray":
+    rgb = image[..., :3]
+    alpha = image[..., 3:] / 255
+    return 255 + (rgb - 255) * alpha
+
+
+def _exceeds_color_threshold(
+    image1: Image.Image, image2: Image.Image, threshold: float
+) -> bool:
+    # Vectorized version of the YIQ color delta check done by pixelmatch. It
+    # leaves out pixelmatch's anti-aliasing detection, so only a negative
+    # result is conclusive.
+    difference = _blend_with_white(
+        np.asarray(image1, dtype=np.float64)
+    ) - _blend_with_white(np.asarray(image2, dtype=np.float64))
+    y = difference @ np.array([0.29889531, 0.58662247, 0.11448223])
+    i = difference @ np.array([0.59597799, -0.27417610, -0.32180189])
+    q = difference @ np.array([0.21147017, -0.52261711, 0.31114694])
+    delta = 0.5053 * y * y + 0.299 * i * i + 0.1957 * q * q
+    # 35215 is the maximum possible value of the YIQ difference metric.
+    return bool((delta > 35215 * threshold * threshold).any())
 
 
 @pytest.fixture(scope="session")
 def assert_to_be_golden(browser_name: str):
-    def compare(received_raw: bytes, golden_name: str):
+    @functools.lru_cache(maxsize=128)
+    def load_golden(golden_name: str):
         golden_file = (_dirname / f"golden-{browser_name}" / golden_name).read_bytes()
-        received_image = Image.open(io.BytesIO(received_raw))
-        golden_image = Image.open(io.BytesIO(golden_file))
+        return Image.open(io.BytesIO(golden_file)).convert("RGBA")
+
+    @functools.lru_cache(maxsize=128)
+    def load_golden_raw_data(golden_name: str):
+        return from_PIL_to_raw_data(load_golden(golden_name))
+
+    def compare(received_raw: bytes, golden_name: str):
+        received_image = Image.open(io.BytesIO(received_raw)).convert("RGBA")
+        golden_image = load_golden(golden_name)
 
         if golden_image.size != received_image.size:
             pytest.fail("Image size differs to golden image")
             return
+        if np and not _exceeds_color_threshold(
+            received_image, golden_image, threshold=0.2
+        ):
+            return
         diff_pixels = pixelmatch(
             from_PIL_to_raw_data(received_image),
-            from_PIL_to_raw_data(golden_image),
+            load_golden_raw_data(golden_name),
             golden_image.size[0],
             golden_image.size[1],
             threshold=0.2,
@@ -27,3 +27,42 @@ def test_listeners(page, server):
     log = []
     page.goto(f"{server.PREFIX}/input/textarea.html")
     assert len(log) == 0
+
+
+def test_listener_can_call_api_while_events_arrive(page):
+    log = []
+
+    def on_console(message):
+        if message.text == "first":
+            # The reply to this call arrives after the "second" console event,
+            # which has to be delivered while this listener is still waiting.
+            log.append(("first", page.evaluate("1 + 1")))
+        else:
+            log.append(message.text)
+
+    page.on("console", on_console)
+    page.evaluate("console.log('first'); console.log('second')")
+    for _ in range(100):
+        if len(log) == 2:
+            break
+        page.wait_for_timeout(10)
+    assert log == ["second", ("first", 2)]
+
+
+def test_listener_error_does_not_stop_event_delivery(page, caplog):
+    log = []
+
+    def on_console(message):
+        log.append(message.text)
+        if message.text == "boom":
+            raise ValueError("boom")
+
+    page.on("console", on_console)
+    page.evaluate("console.log('boom')")
+    page.evaluate("console.log('after')")
+    for _ in range(100):
+        if len(log) == 2:
+            break
+        page.wait_for_timeout(10)
+    assert log == ["boom", "after"]
+    assert "Error dispatching the event" in caplog.text